@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import re
 from io import BytesIO
 
@@ -9,48 +10,64 @@ st.set_page_config(
     page_icon="🥕"
 )
 
-# Helper function to categorize values
-def get_category(position):
-    if position == 1:
-        return "Top 1"
-    elif 2 <= position <= 3:
-        return "Position 2-3"
-    elif 4 <= position <= 5:
-        return "Position 4-5"
-    elif 6 <= position <= 10:
-        return "Position 6-10"
-    elif 11 <= position <= 20:
-        return "Position 11-20"
-    elif position >= 21:
-        return "21+"
-    return None
+# Position buckets used to categorize values
+CATEGORY_BINS = [0, 1, 3, 5, 10, 20, np.inf]
+CATEGORY_LABELS = ["Top 1", "Position 2-3", "Position 4-5", "Position 6-10", "Position 11-20", "21+"]
+# Same column order as the original groupby/unstack summary (alphabetical)
+MARQUE_LABELS = ["Hors Marque", "Marque"]
 
 # Function to process the data
 def process_data(data, regex_pattern):
-    data['Category'] = data['Position'].apply(get_category)
-    data['Marque/Hors Marque'] = data['Keyword'].apply(
-        lambda x: "Marque" if re.search(regex_pattern, str(x), re.IGNORECASE) else "Hors Marque"
+    data['Category'] = pd.cut(data['Position'], bins=CATEGORY_BINS, labels=CATEGORY_LABELS)
+    # Compile once; case-insensitivity is carried by the compiled pattern
+    marque_pattern = re.compile(regex_pattern, re.IGNORECASE)
+    is_marque = data['Keyword'].astype(str).str.contains(marque_pattern, regex=True, na=False)
+    data['Marque/Hors Marque'] = pd.Categorical(
+        np.where(is_marque, "Marque", "Hors Marque"), categories=MARQUE_LABELS
     )
     # Reorder columns: place Category and Marque/Hors Marque after Search Volume
     if "Search Volume" in data.columns:
-        columns = list(data.columns)
-        columns.insert(columns.index("Search Volume") + 1, columns.pop(columns.index("Category")))
-        columns.insert(columns.index("Search Volume") + 2, columns.pop(columns.index("Marque/Hors Marque")))
-        data = data[columns]
+        columns = [col for col in data.columns if col not in ('Category', 'Marque/Hors Marque')]
+        insert_at = columns.index("Search Volume") + 1
+        data = data[columns[:insert_at] + ['Category', 'Marque/Hors Marque'] + columns[insert_at:]]
 
-    # Group by Category and Marque/Hors Marque
-    summary = data.groupby(['Category', 'Marque/Hors Marque']).size().unstack(fill_value=0)
-
-    # Ensure the summary is displayed in the specified order
-    category_order = ["Top 1", "Position 2-3", "Position 4-5", "Position 6-10", "Position 11-20", "21+"]
-    summary = summary.reindex(category_order)
+    # Count Category x Marque/Hors Marque
+    summary = build_summary(data['Category'].cat.codes.to_numpy(), data['Marque/Hors Marque'].cat.codes.to_numpy())
 
     return data, summary
 
+# Build the summary table directly from the categorical codes
+def build_summary(category_codes, marque_codes):
+    counts = np.zeros((len(CATEGORY_LABELS), len(MARQUE_LABELS)), dtype=np.int64)
+    # Positions outside the bins have code -1 and are not counted
+    in_bins = category_codes >= 0
+    np.add.at(counts, (category_codes[in_bins], marque_codes[in_bins]), 1)
+    return pd.DataFrame(
+        counts,
+        index=pd.Index(CATEGORY_LABELS, name='Category'),
+        columns=pd.Index(MARQUE_LABELS, name='Marque/Hors Marque')
+    )
+
+# Cache the Excel parse per uploaded file
+@st.cache_data(max_entries=4)
+def load_excel(file_bytes):
+    return pd.read_excel(BytesIO(file_bytes), engine='calamine')
+
+# Cache the default "Marque" regex (first keyword up to its first dot) per uploaded file
+@st.cache_data(max_entries=16)
+def default_regex(file_bytes):
+    keywords = load_excel(file_bytes)['Keyword']
+    return re.escape(str(keywords.iloc[0]).split('.')[0]).replace("\\", " ") if not keywords.empty else "..."
+
+# Cache the processing per uploaded file and regex pattern
+@st.cache_data(max_entries=8)
+def process_file(file_bytes, regex_pattern):
+    return process_data(load_excel(file_bytes), regex_pattern)
+
 # Export to Excel
 def export_to_excel(df, summary):
     output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
         df.to_excel(writer, index=False, sheet_name='Processed Data')
         summary.to_excel(writer, sheet_name='Summary')
     return output.getvalue()
@@ -65,52 +82,64 @@ with tab1:
     # Step 1: Upload XLSX file
     uploaded_file = st.file_uploader("Upload your XLSX file", type=["xlsx"])
     if uploaded_file:
-        df = pd.read_excel(uploaded_file)
+        file_bytes = uploaded_file.getvalue()
+        df = load_excel(file_bytes)
 
         # Ensure necessary columns exist
         if "Keyword" in df.columns and "Position" in df.columns and "Search Volume" in df.columns:
             # Step 2: Input regex for "Marque"
             col1, col2 = st.columns(2)
             with col1:
-                default_regex = re.escape(df['Keyword'].iloc[0].split('.')[0]).replace("\\", " ") if not df['Keyword'].empty else "..."
-                regex_pattern = st.text_input("Enter regex pattern for 'Marque'", default_regex)
-                selected_category = st.selectbox("Select Category", ["All"] + ["Top 1", "Position 2-3", "Position 4-5", "Position 6-10", "Position 11-20", "21+"])
+                regex_pattern = st.text_input("Enter regex pattern for 'Marque'", default_regex(file_bytes))
+                selected_category = st.selectbox("Select Category", ["All"] + CATEGORY_LABELS)
                 keyword = st.text_input("Enter Keyword (regex supported)")
 
             # Step 3: Process data
-            processed_data, summary = process_data(df, regex_pattern)
+            processed_data, summary = process_file(file_bytes, regex_pattern)
 
             # Filter data based on selected category and keyword
-            filtered_data = processed_data.copy()
-            if selected_category != "All":
-                filtered_data = filtered_data[filtered_data['Category'] == selected_category]
-            if keyword:
-                filtered_data = filtered_data[filtered_data['Keyword'].str.contains(keyword, case=False, na=False)]
+            filtered_data = processed_data
+            summary_table = summary
+            if selected_category != "All" or keyword:
+                category_codes = processed_data['Category'].cat.codes.to_numpy()
+                marque_codes = processed_data['Marque/Hors Marque'].cat.codes.to_numpy()
+                mask = np.ones(len(processed_data), dtype=bool)
+                if selected_category != "All":
+                    mask &= category_codes == CATEGORY_LABELS.index(selected_category)
+                if keyword:
+                    mask &= processed_data['Keyword'].str.contains(keyword, case=False, na=False).to_numpy()
+                filtered_data = processed_data[mask]
+                summary_table = build_summary(category_codes[mask], marque_codes[mask])
 
             # Display summary table
             with col2:
                 st.write("Summary Table:")
-                summary_table = filtered_data.groupby(['Category', 'Marque/Hors Marque']).size().unstack(fill_value=0).reindex(["Top 1", "Position 2-3", "Position 4-5", "Position 6-10", "Position 11-20", "21+"], fill_value=0)
                 st.dataframe(summary_table)
 
             # Display data for Marque and Hors Marque side by side
+            marque_groups = dict(list(filtered_data.groupby('Marque/Hors Marque', observed=True, sort=False)))
             col1, col2 = st.columns(2)
             with col1:
                 st.write("Data for Marque:")
-                marque_data = filtered_data[filtered_data['Marque/Hors Marque'] == 'Marque']
+                marque_data = marque_groups.get('Marque', filtered_data.iloc[:0])
                 st.dataframe(marque_data)
             with col2:
                 st.write("Data for Hors Marque:")
-                hors_marque_data = filtered_data[filtered_data['Marque/Hors Marque'] == 'Hors Marque']
+                hors_marque_data = marque_groups.get('Hors Marque', filtered_data.iloc[:0])
                 st.dataframe(hors_marque_data)
 
-            # Step 5: Export processed data
-            st.download_button(
-                label="Download Processed Data",
-                data=export_to_excel(filtered_data, summary),
-                file_name="processed_data.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+            # Step 5: Export processed data (the workbook is only built on request)
+            export_key = (uploaded_file.file_id, regex_pattern, selected_category, keyword)
+            if st.button("Prepare Download"):
+                st.session_state['semrush_export'] = (export_key, export_to_excel(filtered_data, summary))
+            export = st.session_state.get('semrush_export')
+            if export and export[0] == export_key:
+                st.download_button(
+                    label="Download Processed Data",
+                    data=export[1],
+                    file_name="processed_data.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
         else:
             st.error("The uploaded file must contain 'Keyword', 'Position', and 'Search Volume' columns.")
 
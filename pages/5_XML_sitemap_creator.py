@@ -1,10 +1,11 @@
 import streamlit as st
 import pandas as pd
-import xml.etree.ElementTree as ET
 from datetime import datetime
+import time
 import os
-from urllib.parse import urlparse
+import re
 import io
+import zipfile
 
 st.set_page_config(
     page_title="XML Sitemap Generator",
@@ -12,91 +13,262 @@ st.set_page_config(
     layout="wide"
 )
 
-def validate_url(url):
+# Fixed sitemap envelope around the <url> entries
+SITEMAP_HEADER = (
+    b"<?xml version='1.0' encoding='utf-8'?>\n"
+    b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+)
+SITEMAP_FOOTER = b"</urlset>"
+SITEMAP_INDEX_HEADER = (
+    b"<?xml version='1.0' encoding='utf-8'?>\n"
+    b'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+)
+SITEMAP_INDEX_FOOTER = b"</sitemapindex>"
+
+# Google limits for a single sitemap file
+MAX_URLS_PER_SITEMAP = 50000
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024
+
+# XML entities for the five characters that must be escaped in <loc>;
+# "&" comes first so the replacements below are not escaped twice
+XML_ESCAPES = (
+    ("&", "&amp;"),
+    ("<", "&lt;"),
+    (">", "&gt;"),
+    ('"', "&quot;"),
+    ("'", "&apos;")
+)
+XML_ESCAPE_TABLE = str.maketrans(dict(XML_ESCAPES))
+
+# Sitemap URLs need an http(s) scheme (case-insensitive) followed by a non-empty network location
+URL_PATTERN = re.compile(r'(?i)^https?://[^/\s?#]+')
+
+def lastmod_for_hour(hour_key):
     """
-    Validate that a URL is properly formatted.
-    
+    Return the <lastmod> timestamp for the start of the given hour.
+
+    Derived from the hour alone, so every rerun within the hour gets the same
+    value and the cached sitemap files keyed on it are reused.
+
     Args:
-        url (str): The URL to validate
+        hour_key (int): Hours since the epoch
         
     Returns:
-        bool: True if the URL is valid, False otherwise
+        str: ISO 8601 date with the local timezone offset
     """
-    try:
-        result = urlparse(url.strip())
-        return all([result.scheme, result.netloc])
-    except:
-        return False
+    return datetime.fromtimestamp(hour_key * 3600).astimezone().isoformat(timespec='seconds')
 
-def create_sitemap_from_dataframe(df, changefreq="weekly", priority="0.8"):
+@st.cache_data(max_entries=4)
+def load_urls(file_bytes):
     """
-    Generate an XML sitemap from a pandas DataFrame.
+    Read the first column of an uploaded Excel file.
 
     Args:
-        df (pandas.DataFrame): DataFrame containing URLs in the first column
-        changefreq (str): Frequency of page changes
-        priority (str): Page priority
+        file_bytes (bytes): Content of the uploaded file
         
     Returns:
-        tuple: (xml_string, valid_urls_count, skipped_urls_count)
+        pandas.DataFrame: Single-column DataFrame of raw cells
     """
-    urls = df.iloc[:, 0].tolist()
-    
-    # Create the root element <urlset>
-    urlset_attributes = {
-        "xmlns": "http://www.sitemaps.org/schemas/sitemap/0.9",
-        "xmlns:xhtml": "http://www.w3.org/1999/xhtml"
-    }
-    urlset = ET.Element("urlset", attrib=urlset_attributes)
-
-    # Get the current date for <lastmod>
-    current_date = datetime.now().astimezone().isoformat(timespec='seconds')
-
-    valid_urls = 0
-    skipped_urls = 0
-    invalid_urls = []
-
-    # For each URL, create a <url> element and its children
-    for url_str in urls:
-        if pd.isna(url_str) or not isinstance(url_str, str):
-            skipped_urls += 1
-            continue
-            
-        url_cleaned = url_str.strip()
+    try:
+        return pd.read_excel(io.BytesIO(file_bytes), header=None, usecols=[0], engine='calamine', dtype=str)
+    except ImportError:
+        # python-calamine is not installed: fall back to openpyxl in streaming mode
+        return pd.read_excel(
+            io.BytesIO(file_bytes),
+            header=None,
+            usecols=[0],
+            engine='openpyxl',
+            engine_kwargs={"read_only": True, "data_only": True},
+            dtype=str
+        )
+
+@st.cache_data(max_entries=4)
+def split_urls(file_bytes):
+    """
+    Separate valid URLs from invalid, duplicate and empty cells.
+
+    Keyed on the file bytes, which Streamlit hashes in full; a large Series
+    would only be hashed from a sample of its rows.
+
+    Args:
+        file_bytes (bytes): Content of the uploaded file
         
-        if not validate_url(url_cleaned):
-            invalid_urls.append(url_str)
-            skipped_urls += 1
-            continue
+    Returns:
+        tuple: (valid_urls, invalid_urls, skipped_urls_count, duplicate_urls_count)
+    """
+    urls = load_urls(file_bytes).iloc[:, 0]
+
+    # Arrow-backed strings run strip/match in pyarrow's C++ kernels (RE2 for regexes)
+    url_strings = urls.astype("string[pyarrow]")
+    cleaned_urls = url_strings.str.strip()
+
+    # A sitemap must not list the same <loc> twice
+    unique_urls = cleaned_urls.drop_duplicates()
+    duplicate_urls = int(cleaned_urls.notna().sum() - unique_urls.notna().sum())
+
+    # Validate the whole column at once; empty cells are skipped, not reported
+    is_filled = unique_urls.notna()
+    # The anchored pattern rejects other schemes straight away, so no prefix prefilter is needed
+    is_valid = unique_urls.str.match(URL_PATTERN.pattern, na=False).astype(bool)
+
+    valid_urls = unique_urls[is_valid]
+    invalid_urls = url_strings.loc[unique_urls.index][is_filled & ~is_valid].tolist()
+    skipped_urls = len(urls) - len(valid_urls)
 
-        url_element = ET.SubElement(urlset, "url")
+    return valid_urls, invalid_urls, skipped_urls, duplicate_urls
+
+def stream_sitemap(valid_urls, changefreq, priority, current_date, chunk_size=1000):
+    """
+    Yield the sitemap XML as UTF-8 byte chunks.
+
+    Args:
+        valid_urls (pandas.Series): Cleaned, valid URLs
+        changefreq (str): Frequency of page changes
+        priority (str): Page priority
+        current_date (str): ISO 8601 date used for <lastmod>
+        chunk_size (int): Number of <url> entries per chunk
         
-        loc_element = ET.SubElement(url_element, "loc")
-        loc_element.text = url_cleaned
+    Yields:
+        bytes: The header, then blocks of chunk_size entries, then the footer
+    """
+    # Everything after <loc> is identical for every URL, so build it once
+    url_suffix = (
+        f"</loc>\n"
+        f"    <lastmod>{current_date}</lastmod>\n"
+        f"    <changefreq>{changefreq}</changefreq>\n"
+        f"    <priority>{priority}</priority>\n"
+        f"  </url>\n"
+    )
+
+    # Arrow's literal substring replace is much faster than a per-character translate
+    escaped_urls = valid_urls
+    for char, entity in XML_ESCAPES:
+        escaped_urls = escaped_urls.str.replace(char, entity, regex=False)
+
+    yield SITEMAP_HEADER
+    for start in range(0, len(valid_urls), chunk_size):
+        # Build each block of indented <url> entries in one vectorized string join
+        chunk = escaped_urls.iloc[start:start + chunk_size]
+        url_entries = "  <url>\n    <loc>" + chunk + url_suffix
+        yield url_entries.str.cat().encode('utf-8')
+    yield SITEMAP_FOOTER
+
+def build_sitemap_xml(valid_urls, changefreq, priority, current_date):
+    """
+    Serialize already validated URLs into sitemap XML.
+
+    Args:
+        valid_urls (pandas.Series): Cleaned, valid URLs
+        changefreq (str): Frequency of page changes
+        priority (str): Page priority
+        current_date (str): ISO 8601 date used for <lastmod>
         
-        lastmod_element = ET.SubElement(url_element, "lastmod")
-        lastmod_element.text = current_date
+    Returns:
+        bytes: The UTF-8 encoded XML document
+    """
+    # Text is encoded chunk by chunk, so the whole document never exists as a str
+    return b"".join(stream_sitemap(valid_urls, changefreq, priority, current_date))
+
+def build_sitemap_index(sitemap_urls, current_date):
+    """
+    Serialize a sitemap index pointing at several sitemaps.
+
+    Args:
+        sitemap_urls (list): Absolute URLs of the sitemaps
+        current_date (str): ISO 8601 date used for <lastmod>
         
-        changefreq_element = ET.SubElement(url_element, "changefreq")
-        changefreq_element.text = changefreq
+    Returns:
+        bytes: The UTF-8 encoded XML document
+    """
+    entries = "".join(
+        f"  <sitemap>\n"
+        f"    <loc>{url.translate(XML_ESCAPE_TABLE)}</loc>\n"
+        f"    <lastmod>{current_date}</lastmod>\n"
+        f"  </sitemap>\n"
+        for url in sitemap_urls
+    )
+    return b"".join((SITEMAP_INDEX_HEADER, entries.encode('utf-8'), SITEMAP_INDEX_FOOTER))
+
+@st.cache_data(max_entries=4)
+def build_sitemap_files(file_bytes, changefreq, priority, current_date):
+    """
+    Serialize the valid URLs of a file into as many sitemaps as Google's limits require.
+
+    Args:
+        file_bytes (bytes): Content of the uploaded file
+        changefreq (str): Frequency of page changes
+        priority (str): Page priority
+        current_date (str): ISO 8601 date used for <lastmod>
         
-        priority_element = ET.SubElement(url_element, "priority")
-        priority_element.text = priority
+    Returns:
+        list: (filename, xml_bytes) pairs, ending with a sitemap index when the URLs are split
+    """
+    valid_urls = split_urls(file_bytes)[0]
+    parts = [
+        valid_urls.iloc[start:start + MAX_URLS_PER_SITEMAP]
+        for start in range(0, len(valid_urls), MAX_URLS_PER_SITEMAP)
+    ] or [valid_urls]
+
+    documents = []
+    while parts:
+        part = parts.pop(0)
+        xml = build_sitemap_xml(part, changefreq, priority, current_date)
+        # Very long URLs can exceed the size limit first: halve the part and retry
+        if len(xml) > MAX_SITEMAP_BYTES and len(part) > 1:
+            middle = len(part) // 2
+            parts[:0] = [part.iloc[:middle], part.iloc[middle:]]
+        else:
+            documents.append(xml)
+
+    if len(documents) == 1:
+        return [("sitemap.xml", documents[0])]
+
+    sitemap_files = [(f"sitemap-{number}.xml", xml) for number, xml in enumerate(documents, start=1)]
+
+    # The index expects the sitemaps to be uploaded to the site root
+    site_root = URL_PATTERN.match(valid_urls.iloc[0]).group(0)
+    sitemap_index = build_sitemap_index([f"{site_root}/{name}" for name, _ in sitemap_files], current_date)
+
+    return sitemap_files + [("sitemap_index.xml", sitemap_index)]
+
+def zip_sitemaps(sitemap_files):
+    """
+    Bundle several sitemap files into a ZIP archive.
+
+    Args:
+        sitemap_files (list): (filename, xml_bytes) pairs
         
-        valid_urls += 1
+    Returns:
+        bytes: The ZIP archive
+    """
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for filename, xml in sitemap_files:
+            archive.writestr(filename, xml)
+    return zip_buffer.getvalue()
 
-    # Create an ElementTree object from the root element
-    tree = ET.ElementTree(urlset)
-    
-    # Indentation for more readable XML
-    ET.indent(tree, space="  ", level=0)
+def create_sitemap_from_file(file_bytes, changefreq="weekly", priority="0.8"):
+    """
+    Generate an XML sitemap from an uploaded Excel file.
+
+    Args:
+        file_bytes (bytes): Content of the uploaded file, with URLs in the first column
+        changefreq (str): Frequency of page changes
+        priority (str): Page priority
+        
+    Returns:
+        tuple: (sitemap_files, valid_urls_count, skipped_urls_count, invalid_urls, duplicate_urls_count)
+    """
+    # Get the current date for <lastmod>; it is stable for an hour so the
+    # generated files can be reused from the cache
+    current_date = lastmod_for_hour(int(time.time()) // 3600)
 
-    # Convert to XML string
-    xml_buffer = io.BytesIO()
-    tree.write(xml_buffer, encoding='utf-8', xml_declaration=True)
-    xml_string = xml_buffer.getvalue()
+    # Validation and serialization are cached separately, so changing
+    # changefreq or priority does not validate the URLs again
+    valid_urls, invalid_urls, skipped_urls, duplicate_urls = split_urls(file_bytes)
+    sitemap_files = build_sitemap_files(file_bytes, changefreq, priority, current_date)
     
-    return xml_string, valid_urls, skipped_urls, invalid_urls
+    return sitemap_files, len(valid_urls), skipped_urls, invalid_urls, duplicate_urls
 
 def main():
     st.title("🗺️ XML Sitemap Generator")
@@ -137,7 +309,8 @@ def main():
         if uploaded_file is not None:
             try:
                 # Read the Excel file
-                df = pd.read_excel(uploaded_file, header=None, usecols=[0])
+                file_bytes = uploaded_file.getvalue()
+                df = load_urls(file_bytes)
                 
                 st.success(f"✅ File loaded successfully! {len(df)} lines detected.")
                 
@@ -154,16 +327,36 @@ def main():
                 if len(df) > 10:
                     st.info(f"Showing first 10 URLs out of {len(df)} total.")
                 
-                # Generate button
+                # Generate button; the result is kept in the session so reruns
+                # (downloading, opening the preview) don't rebuild the sitemap
+                sitemap_key = (uploaded_file.file_id, changefreq, priority)
                 if st.button("🚀 Generate Sitemap", type="primary", use_container_width=True):
                     with st.spinner("Generating sitemap..."):
-                        xml_content, valid_urls, skipped_urls, invalid_urls = create_sitemap_from_dataframe(
-                            df, changefreq, str(priority)
+                        sitemap_files, valid_urls, skipped_urls, invalid_urls, duplicate_urls = create_sitemap_from_file(
+                            file_bytes, changefreq, str(priority)
                         )
                     
+                        # A single sitemap is downloaded as XML, a split one as a ZIP with its index
+                        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                        if len(sitemap_files) == 1:
+                            download = (sitemap_files[0][1], f"sitemap_{timestamp}.xml", "application/xml")
+                        else:
+                            download = (zip_sitemaps(sitemap_files), f"sitemaps_{timestamp}.zip", "application/zip")
+                    
+                    st.session_state['sitemap_result'] = (
+                        sitemap_key,
+                        (sitemap_files, valid_urls, skipped_urls, invalid_urls, duplicate_urls, download)
+                    )
+                
+                sitemap_result = st.session_state.get('sitemap_result')
+                if sitemap_result and sitemap_result[0] == sitemap_key:
+                    sitemap_files, valid_urls, skipped_urls, invalid_urls, duplicate_urls, download = sitemap_result[1]
+                    download_data, filename, mime = download
+                    xml_content = sitemap_files[0][1]
+                    
                     # Show statistics
                     st.markdown("### 📊 Results")
-                    col1, col2, col3 = st.columns(3)
+                    col1, col2, col3, col4 = st.columns(4)
                     
                     with col1:
                         st.metric("Valid URLs", valid_urls, delta=None)
@@ -172,7 +365,16 @@ def main():
                         st.metric("Skipped URLs", skipped_urls, delta=None)
                     
                     with col3:
-                        st.metric("File size", f"{len(xml_content)} bytes", delta=None)
+                        st.metric("Duplicates removed", duplicate_urls, delta=None)
+                    
+                    with col4:
+                        st.metric("File size", f"{len(download_data)} bytes", delta=None)
+                    
+                    if len(sitemap_files) > 1:
+                        st.info(
+                            f"📦 {len(sitemap_files) - 1} sitemaps and a sitemap index were generated "
+                            f"(Google allows at most 50,000 URLs and 50 MB per sitemap)."
+                        )
                     
                     # Show invalid URLs if any
                     if invalid_urls:
@@ -185,20 +387,20 @@ def main():
                     # Download button
                     st.markdown("### 📥 Download")
                     
-                    filename = f"sitemap_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xml"
-                    
                     st.download_button(
                         label="📥 Download XML Sitemap",
-                        data=xml_content,
+                        data=download_data,
                         file_name=filename,
-                        mime="application/xml",
+                        mime=mime,
                         type="primary",
                         use_container_width=True
                     )
                     
                     # Preview of the generated XML
                     with st.expander("👁️ Generated XML Preview"):
-                        st.code(xml_content.decode('utf-8')[:2000] + "..." if len(xml_content) > 2000 else xml_content.decode('utf-8'), language="xml")
+                        # Decode only the previewed bytes, not the whole sitemap
+                        preview = xml_content[:2000].decode('utf-8', errors='ignore')
+                        st.code(preview + "..." if len(xml_content) > 2000 else preview, language="xml")
                     
                     st.success("✨ Sitemap generated successfully!")
             
@@ -299,7 +501,9 @@ def main():
         - ❌ `example.com` (without protocol)
         - ❌ `/page` (relative URL)
         - ❌ `www.example.com` (without protocol)
+        - ❌ `ftp://example.com` (only http and https are allowed)
         - ❌ Empty or invalid cells
+        - ❌ Duplicates (each URL is listed only once)
         """)
         
         st.markdown("""
@@ -321,6 +525,7 @@ def main():
         
         - **Maximum 50,000 URLs** per sitemap (Google limit)
         - **Maximum size:** 50 MB uncompressed
+        - **Larger lists** are split automatically into several sitemaps plus a `sitemap_index.xml`, downloaded as a ZIP (upload them to your site root)
         - **Encoding:** UTF-8 required
         - **Updates:** Regular updates recommended
         - **Validation:** Test your sitemap with online tools
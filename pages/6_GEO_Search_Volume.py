@@ -1,8 +1,12 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import requests
-import json
-import base64
+import orjson
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import OrderedDict
+from http.cookiejar import DefaultCookiePolicy
 from io import BytesIO
 import time
 
@@ -12,49 +16,205 @@ st.set_page_config(
     layout="wide"
 )
 
+# Supported locations and languages, with their display names
+LOCATION_NAMES = {
+    2840: "United States",
+    2826: "United Kingdom", 
+    2250: "France",
+    2276: "Germany",
+    2724: "Spain",
+    2380: "Italy",
+    2392: "Japan"
+}
+LANGUAGE_NAMES = {
+    "en": "English",
+    "fr": "French",
+    "de": "German", 
+    "es": "Spanish",
+    "it": "Italian",
+    "ja": "Japanese"
+}
+LOCATION_CODES = list(LOCATION_NAMES)
+LANGUAGE_CODES = list(LANGUAGE_NAMES)
+
+DATAFORSEO_URL = 'https://api.dataforseo.com/v3/ai_optimization/ai_keyword_data/keywords_search_volume/live'
+
+# Keywords sent per API call (the endpoint's per-task limit, so lists up to
+# that size are a single paid task), and how many calls run at once
+KEYWORDS_PER_REQUEST = 1000
+MAX_PARALLEL_REQUESTS = 8
+
+# Keywords accepted per run, now that large lists are split into batches
+MAX_KEYWORDS = 10000
+
+# Seconds to wait on the API before giving up, so a stalled call cannot hang the page
+REQUEST_TIMEOUT = 60
+
+# Responses kept per browser session, so repeated runs don't pay for the same keywords twice
+MAX_CACHED_RESPONSES = 128
+CACHED_RESPONSE_TTL = 3600
+
+# Social links shown at the bottom of the sidebar
+SIDEBAR_HTML = """
+    <div style="position: fixed; bottom: 10px; left: 20px;">
+        <a href="https://github.com/Psimon8" target="_blank" style="text-decoration: none;">
+            <img src="https://github.githubassets.com/assets/pinned-octocat-093da3e6fa40.svg" 
+                 alt="GitHub Simon le Coz" style="width:20px; vertical-align: middle; margin-right: 5px;">
+            <span style="color: white; font-size: 14px;"></span>
+        </a>    
+        <a href="https://www.linkedin.com/in/simon-le-coz/" target="_blank" style="text-decoration: none;">
+            <img src="https://static.licdn.com/aero-v1/sc/h/8s162nmbcnfkg7a0k8nq9wwqo" 
+                 alt="LinkedIn Simon Le Coz" style="width:20px; vertical-align: middle; margin-right: 5px;">
+            <span style="color: white; font-size: 14px;"></span>
+        </a>
+        <a href="https://twitter.com/lekoz_simon" target="_blank" style="text-decoration: none;">
+            <img src="https://abs.twimg.com/favicons/twitter.3.ico" 
+                 alt="Twitter Simon Le Coz" style="width:20px; vertical-align: middle; margin-right: 5px;">
+            <span style="color: white; font-size: 14px;">@lekoz_simon</span>
+        </a>
+    </div>
+    """
+
+def clean_keywords(values):
+    """
+    Strip and lowercase keywords and drop empty values using Arrow-backed string kernels
+    """
+    keywords = pd.Series(values).dropna().astype('string[pyarrow]').str.strip().str.lower()
+    return keywords[keywords != ''].tolist()
+
+@st.cache_data(max_entries=8)
+def parse_pasted_keywords(keywords_text):
+    """
+    Clean pasted keywords, cached on the raw text so reruns skip the parse
+    """
+    return clean_keywords(keywords_text.split('\n'))
+
+@st.cache_data(max_entries=4)
+def load_keywords(file_bytes):
+    """
+    Read and clean the keywords in the first column of an uploaded Excel file
+    """
+    try:
+        # Only the first column of the first sheet, read as text to skip type inference
+        df_upload = pd.read_excel(BytesIO(file_bytes), sheet_name=0, header=None, usecols=[0], engine='calamine', dtype=str)
+    except ImportError:
+        # python-calamine is not installed: fall back to openpyxl in streaming mode
+        df_upload = pd.read_excel(
+            BytesIO(file_bytes),
+            sheet_name=0,
+            header=None,
+            usecols=[0],
+            engine='openpyxl',
+            engine_kwargs={"read_only": True, "data_only": True},
+            dtype=str
+        )
+    return clean_keywords(df_upload.iloc[:, 0])
+
+@st.cache_resource
+def get_http_session():
+    """
+    Shared HTTP session, so connections to DataforSEO stay open between runs
+    """
+    session = requests.Session()
+    # Shared by every user: credentials are sent per request and cookies are never stored
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    session.mount('https://', HTTPAdapter(pool_maxsize=MAX_PARALLEL_REQUESTS))
+    return session
+
 def make_dataforseo_request(login, password, keywords, location_code=2840, language_code="en"):
     """
-    Make request to DataforSEO API for search volume data
+    Make request to DataforSEO API for search volume data, posting keyword batches in parallel
     """
-    # Encode credentials
-    credentials = base64.b64encode(f"{login}:{password}".encode()).decode()
+    language_name = LANGUAGE_NAMES.get(language_code, "English")
     
-    # Prepare request data according to DataforSEO documentation
-    post_data = dict()
-    post_data[0] = dict(
-        language_name="English" if language_code == "en" else {
-            "fr": "French",
-            "de": "German", 
-            "es": "Spanish",
-            "it": "Italian",
-            "ja": "Japanese"
-        }.get(language_code, "English"),
-        location_code=location_code,
-        keywords=keywords
-    )
+    batches = [keywords[i:i + KEYWORDS_PER_REQUEST] for i in range(0, len(keywords), KEYWORDS_PER_REQUEST)]
     
-    headers = {
-        'Authorization': f'Basic {credentials}',
-        'Content-Type': 'application/json'
-    }
+    def post_batch(batch):
+        # Prepare request data according to DataforSEO documentation
+        post_data = dict()
+        post_data[0] = dict(
+            language_name=language_name,
+            location_code=location_code,
+            keywords=batch
+        )
+        # orjson encodes straight to bytes; the integer task key is written as "0" like json.dumps
+        return session.post(
+            DATAFORSEO_URL,
+            data=orjson.dumps(post_data, option=orjson.OPT_NON_STR_KEYS),
+            headers={'Content-Type': 'application/json'},
+            auth=(login, password),
+            timeout=REQUEST_TIMEOUT
+        )
     
+    # Network latency dominates, so batches share pooled connections and run concurrently;
+    # each batch is collected on its own so one failure doesn't discard the others
+    session = get_http_session()
+    progress_bar = st.progress(0.0)
+    responses = [None] * len(batches)
+    failed_batches = []
     try:
-        # Correct API endpoint
-        response = requests.post(
-            'https://api.dataforseo.com/v3/ai_optimization/ai_keyword_data/keywords_search_volume/live',
-            data=json.dumps(post_data),
-            headers=headers
-        )
-        
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_REQUESTS) as executor:
+            futures = {executor.submit(post_batch, batch): i for i, batch in enumerate(batches)}
+            for done, future in enumerate(as_completed(futures), start=1):
+                try:
+                    responses[futures[future]] = future.result()
+                except Exception as e:
+                    failed_batches.append((futures[future], e))
+                progress_bar.progress(done / len(batches), text=f"{done}/{len(batches)} batches received")
+    finally:
+        progress_bar.empty()
+    
+    for i, e in sorted(failed_batches, key=lambda failure: failure[0]):
+        st.error(f"Request failed for batch {i + 1}/{len(batches)} ({len(batches[i])} keywords): {str(e)}")
+    
+    # Merge the tasks of every batch into a single response
+    tasks = []
+    cost = 0
+    for response in responses:
+        if response is None:
+            continue
         if response.status_code == 200:
-            return response.json()
+            # A 200 from a proxy or gateway may not be JSON; skip that batch like a failed one
+            try:
+                response_json = orjson.loads(response.content)
+            except orjson.JSONDecodeError as e:
+                st.error(f"Request failed: invalid JSON in API response ({str(e)})")
+                continue
+            tasks.extend(response_json.get('tasks') or [])
+            cost += response_json.get('cost') or 0
         else:
             st.error(f"API Error: {response.status_code} - {response.text}")
-            return None
-            
-    except Exception as e:
-        st.error(f"Request failed: {str(e)}")
+    
+    if not tasks:
         return None
+    
+    return {'cost': cost, 'tasks_count': len(tasks), 'tasks': tasks}
+
+def fetch_search_volume(login, password, keywords, location_code=2840, language_code="en"):
+    """
+    Return the DataforSEO response for these keywords, reusing the ones already fetched in this session
+    """
+    # Kept in session_state rather than st.cache_data so paid results are never shared between users
+    cache = st.session_state.setdefault('dataforseo_responses', OrderedDict())
+    # The same keywords in another order are the same request
+    cache_key = (login, location_code, language_code, tuple(sorted(keywords)))
+    cached = cache.get(cache_key)
+    if cached and time.time() - cached[0] < CACHED_RESPONSE_TTL:
+        cache.move_to_end(cache_key)
+        return cached[1]
+    
+    response_data = make_dataforseo_request(login, password, keywords, location_code, language_code)
+    
+    # Only cache complete responses, so failed batches are retried on the next run
+    batches_count = -(-len(keywords) // KEYWORDS_PER_REQUEST)
+    if (response_data and response_data['tasks_count'] == batches_count
+            and all(task.get('status_code') == 20000 for task in response_data['tasks'])):
+        cache[cache_key] = (time.time(), response_data)
+        cache.move_to_end(cache_key)
+        if len(cache) > MAX_CACHED_RESPONSES:
+            cache.popitem(last=False)
+    
+    return response_data
 
 def process_api_response(response_data, location_code, language_code):
     """
@@ -64,106 +224,100 @@ def process_api_response(response_data, location_code, language_code):
         return None
     
     # Get location and language names
-    location_name = {
-        2840: "United States",
-        2826: "United Kingdom", 
-        2250: "France",
-        2276: "Germany",
-        2724: "Spain",
-        2380: "Italy",
-        2392: "Japan"
-    }.get(location_code, str(location_code))
+    location_name = LOCATION_NAMES.get(location_code, str(location_code))
+    language_name = LANGUAGE_NAMES.get(language_code, language_code)
     
-    language_name = {
-        "en": "English",
-        "fr": "French",
-        "de": "German", 
-        "es": "Spanish",
-        "it": "Italian",
-        "ja": "Japanese"
-    }.get(language_code, language_code)
-    
-    results = []
+    # Fill columns directly rather than building one dict per keyword;
+    # monthly data is flattened so it can be sorted and reduced in one NumPy pass
+    keyword_col = []
+    volume_col = []
+    month_rows = []
+    month_keys = []
+    month_volumes = []
     for task in response_data['tasks']:
         if task['status_code'] == 20000 and 'result' in task:
             for result_item in task['result']:
                 if 'items' in result_item:
                     for item in result_item['items']:
-                        # Base data
-                        row_data = {
-                            'Keyword': item.get('keyword', ''),
-                            'Language': language_name,
-                            'Country': location_name
-                        }
+                        row = len(keyword_col)
+                        keyword_col.append(item.get('keyword', ''))
+                        volume_col.append(item.get('ai_search_volume', 0))
                         
-                        # Process monthly data
-                        monthly_data = item.get('ai_monthly_searches', [])
-                        if monthly_data:
-                            # Sort by year and month (most recent first)
-                            monthly_data = sorted(monthly_data, 
-                                                key=lambda x: (x.get('year', 0), x.get('month', 0)), 
-                                                reverse=True)
-                            
-                            # Get latest month volume
-                            latest_volume = monthly_data[0].get('ai_search_volume', 0)
-                            row_data['Latest Month Volume'] = latest_volume
-                            
-                            # Calculate percentage change
-                            if len(monthly_data) > 1:
-                                oldest_volume = monthly_data[-1].get('ai_search_volume', 0)
-                                if oldest_volume > 0:
-                                    percentage_change = ((latest_volume - oldest_volume) / oldest_volume) * 100
-                                    row_data['Change %'] = round(percentage_change, 2)
-                                else:
-                                    row_data['Change %'] = 0
-                            else:
-                                row_data['Change %'] = 0
-                            
-                            # Add monthly columns
-                            for month_data in monthly_data:
-                                year = month_data.get('year', 0)
-                                month = month_data.get('month', 0)
-                                volume = month_data.get('ai_search_volume', 0)
-                                
-                                # Format: MM/YYYY
-                                month_header = f"{month:02d}/{year}"
-                                row_data[month_header] = volume
-                        else:
-                            # No monthly data
-                            row_data['Latest Month Volume'] = item.get('ai_search_volume', 0)
-                            row_data['Change %'] = 0
-                        
-                        results.append(row_data)
+                        # Process monthly data, as YYYYMM keys
+                        for month_data in item.get('ai_monthly_searches') or []:
+                            month_rows.append(row)
+                            month_keys.append(month_data.get('year', 0) * 100 + month_data.get('month', 0))
+                            month_volumes.append(month_data.get('ai_search_volume', 0))
         else:
             st.error(f"Task error - Status: {task.get('status_code')}, Message: {task.get('status_message', 'Unknown error')}")
     
-    return pd.DataFrame(results) if results else None
+    if not keyword_col:
+        return None
+    
+    # Keywords without monthly data keep their overall volume and no change
+    # Volumes may be null in the API response; floats carry them as NaN
+    latest_volumes = np.array(volume_col, dtype=float)
+    changes = np.zeros(len(keyword_col))
+    monthly = pd.DataFrame(index=pd.RangeIndex(len(keyword_col)))
+    if month_rows:
+        month_rows = np.array(month_rows)
+        month_keys = np.array(month_keys)
+        month_volumes = np.array(month_volumes, dtype=float)
+        
+        # Sort by keyword, then by year and month, so each keyword's oldest and
+        # latest months are the first and last entries of its run
+        order = np.lexsort((month_keys, month_rows))
+        sorted_rows = month_rows[order]
+        sorted_volumes = month_volumes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+        ends = np.r_[starts[1:], len(order)] - 1
+        rows = sorted_rows[starts]
+        oldest = sorted_volumes[starts]
+        latest = sorted_volumes[ends]
+        
+        # Calculate percentage change
+        latest_volumes[rows] = latest
+        with np.errstate(divide='ignore', invalid='ignore'):
+            changes[rows] = np.where(oldest > 0, (latest - oldest) / oldest * 100, 0).round(2)
+        
+        # Add monthly columns, most recent first; missing months stay empty
+        keys, key_index = np.unique(month_keys, return_inverse=True)
+        grid = np.full((len(keyword_col), len(keys)), np.nan)
+        grid[month_rows, key_index] = month_volumes
+        # Format: MM/YYYY; nullable integers keep missing months empty without
+        # falling back to floats, and convert to Arrow without per-cell checks
+        monthly = pd.DataFrame(
+            grid[:, ::-1], columns=[f"{key % 100:02d}/{key // 100}" for key in keys[::-1]]
+        ).astype('Int64')
+    
+    results = pd.DataFrame({
+        'Keyword': keyword_col,
+        'Language': language_name,
+        'Country': location_name,
+        'Latest Month Volume': pd.array(latest_volumes, dtype='Int64'),
+        'Change %': changes
+    })
+    return pd.concat([results, monthly], axis=1)
 
+@st.cache_data(max_entries=8, show_spinner=False)
 def export_to_excel(df):
     """
     Export DataFrame to Excel format with proper formatting
     """
     output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
         # Export main data
         df.to_excel(writer, index=False, sheet_name='Search Volume Data')
         
-        # Get the workbook and worksheet for formatting
-        workbook = writer.book
+        # Get the worksheet for formatting
         worksheet = writer.sheets['Search Volume Data']
         
-        # Auto-adjust column widths
-        for column in worksheet.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            worksheet.column_dimensions[column_letter].width = adjusted_width
+        # Auto-adjust column widths from the data, as xlsxwriter cannot read cells back
+        max_lengths = df.astype(str).apply(lambda column: column.str.len().max()).to_numpy()
+        header_lengths = df.columns.astype(str).str.len().to_numpy()
+        adjusted_widths = np.minimum(np.maximum(max_lengths, header_lengths) + 2, 50)
+        for i, adjusted_width in enumerate(adjusted_widths):
+            worksheet.set_column(i, i, adjusted_width)
     
     return output.getvalue()
 
@@ -191,31 +345,16 @@ def main():
         with col1:
             location_code = st.selectbox(
                 "Location",
-                [2840, 2826, 2250, 2276, 2724, 2380, 2392],
-                format_func=lambda x: {
-                    2840: "United States",
-                    2826: "United Kingdom", 
-                    2250: "France",
-                    2276: "Germany",
-                    2724: "Spain",
-                    2380: "Italy",
-                    2392: "Japan"
-                }.get(x, str(x)),
+                LOCATION_CODES,
+                format_func=LOCATION_NAMES.get,
                 help="Select the target location for search volume data"
             )
         
         with col2:
             language_code = st.selectbox(
                 "Language",
-                ["en", "fr", "de", "es", "it", "ja"],
-                format_func=lambda x: {
-                    "en": "English",
-                    "fr": "French",
-                    "de": "German", 
-                    "es": "Spanish",
-                    "it": "Italian",
-                    "ja": "Japanese"
-                }.get(x, x),
+                LANGUAGE_CODES,
+                format_func=LANGUAGE_NAMES.get,
                 help="Select the target language"
             )
         
@@ -242,7 +381,7 @@ def main():
                 )
                 
                 if keywords_text:
-                    keywords = [kw.strip() for kw in keywords_text.split('\n') if kw.strip()]
+                    keywords = parse_pasted_keywords(keywords_text)
                     st.info(f"📊 {len(keywords)} keywords detected")
             
             else:  # Upload Excel File
@@ -254,8 +393,7 @@ def main():
                 
                 if uploaded_file:
                     try:
-                        df_upload = pd.read_excel(uploaded_file, header=None, usecols=[0])
-                        keywords = [str(kw).strip() for kw in df_upload.iloc[:, 0].tolist() if pd.notna(kw) and str(kw).strip()]
+                        keywords = load_keywords(uploaded_file.getvalue())
                         st.success(f"✅ {len(keywords)} keywords loaded from file")
                         
                         # Show preview
@@ -269,6 +407,12 @@ def main():
                     except Exception as e:
                         st.error(f"Error reading file: {str(e)}")
             
+            # Duplicates are charged as separate keywords, so each one is only sent once
+            unique_keywords = list(dict.fromkeys(keywords))
+            if len(unique_keywords) < len(keywords):
+                st.info(f"🧹 {len(keywords) - len(unique_keywords)} duplicate keywords removed")
+                keywords = unique_keywords
+            
             # API Request section
             if keywords:
                 st.markdown("### 🚀 Get Search Volume Data")
@@ -282,18 +426,22 @@ def main():
                 """)
                 
                 if st.button("📊 Get Search Volume Data", type="primary", use_container_width=True):
-                    if len(keywords) > 1000:
-                        st.error("Maximum 1000 keywords per request. Please reduce the number of keywords.")
+                    if len(keywords) > MAX_KEYWORDS:
+                        st.error(f"Maximum {MAX_KEYWORDS} keywords per request. Please reduce the number of keywords.")
                     else:
                         with st.spinner(f"Fetching search volume data for {len(keywords)} keywords..."):
-                            response_data = make_dataforseo_request(
+                            response_data = fetch_search_volume(
                                 login, password, keywords, location_code, language_code
                             )
                             
                             if response_data:
                                 # Add debug expander
                                 with st.expander("🐛 Debug - API Response (click to expand)"):
-                                    st.json(response_data)
+                                    # Serializing every task would send the whole payload on each run,
+                                    # so only the first batch is shown
+                                    st.json({**response_data, 'tasks': response_data['tasks'][:1]})
+                                    if response_data['tasks_count'] > 1:
+                                        st.caption(f"Showing the first of {response_data['tasks_count']} tasks")
                                 
                                 df_results = process_api_response(response_data, location_code, language_code)
                                 
@@ -303,32 +451,26 @@ def main():
                                     # Display results
                                     st.markdown("### 📊 Results")
                                     
-                                    # Summary metrics
+                                    # Summary metrics; process_api_response always fills these columns,
+                                    # so they are reduced once on the underlying arrays, skipping missing volumes
+                                    latest_volumes = df_results['Latest Month Volume'].to_numpy(dtype=float, na_value=np.nan)
+                                    total_volume = np.nansum(latest_volumes)
+                                    avg_volume = np.nanmean(latest_volumes) if not np.isnan(latest_volumes).all() else 0
+                                    avg_change = np.nanmean(df_results['Change %'].to_numpy()) if df_results['Change %'].notna().any() else 0
+                                    
                                     col1, col2, col3, col4 = st.columns(4)
                                     
                                     with col1:
                                         st.metric("Total Keywords", len(df_results))
                                     
                                     with col2:
-                                        if 'Latest Month Volume' in df_results.columns:
-                                            avg_volume = df_results['Latest Month Volume'].mean()
-                                            st.metric("Avg Latest Volume", f"{avg_volume:,.0f}")
-                                        else:
-                                            st.metric("Avg Latest Volume", "N/A")
+                                        st.metric("Avg Latest Volume", f"{avg_volume:,.0f}")
                                     
                                     with col3:
-                                        if 'Latest Month Volume' in df_results.columns:
-                                            total_volume = df_results['Latest Month Volume'].sum()
-                                            st.metric("Total Latest Volume", f"{total_volume:,.0f}")
-                                        else:
-                                            st.metric("Total Latest Volume", "N/A")
+                                        st.metric("Total Latest Volume", f"{total_volume:,.0f}")
                                     
                                     with col4:
-                                        if 'Change %' in df_results.columns:
-                                            avg_change = df_results['Change %'].mean()
-                                            st.metric("Avg Change %", f"{avg_change:.1f}%")
-                                        else:
-                                            st.metric("Avg Change %", "N/A")
+                                        st.metric("Avg Change %", f"{avg_change:.1f}%")
                                     
                                     # Display data table
                                     st.dataframe(df_results, use_container_width=True)
@@ -422,7 +564,7 @@ def main():
         
         **Copy/Paste Method:**
         - Enter keywords one per line
-        - Maximum 1000 keywords per request
+        - Maximum 10,000 keywords per request, sent in batches of 1,000
         - Ideal for quick analysis
         
         **Excel Upload Method:**
@@ -468,25 +610,4 @@ if __name__ == "__main__":
     main()
 
 # Add social links in sidebar
-st.sidebar.markdown(
-    """
-    <div style="position: fixed; bottom: 10px; left: 20px;">
-        <a href="https://github.com/Psimon8" target="_blank" style="text-decoration: none;">
-            <img src="https://github.githubassets.com/assets/pinned-octocat-093da3e6fa40.svg" 
-                 alt="GitHub Simon le Coz" style="width:20px; vertical-align: middle; margin-right: 5px;">
-            <span style="color: white; font-size: 14px;"></span>
-        </a>    
-        <a href="https://www.linkedin.com/in/simon-le-coz/" target="_blank" style="text-decoration: none;">
-            <img src="https://static.licdn.com/aero-v1/sc/h/8s162nmbcnfkg7a0k8nq9wwqo" 
-                 alt="LinkedIn Simon Le Coz" style="width:20px; vertical-align: middle; margin-right: 5px;">
-            <span style="color: white; font-size: 14px;"></span>
-        </a>
-        <a href="https://twitter.com/lekoz_simon" target="_blank" style="text-decoration: none;">
-            <img src="https://abs.twimg.com/favicons/twitter.3.ico" 
-                 alt="Twitter Simon Le Coz" style="width:20px; vertical-align: middle; margin-right: 5px;">
-            <span style="color: white; font-size: 14px;">@lekoz_simon</span>
-        </a>
-    </div>
-    """,
-    unsafe_allow_html=True
-)
+st.sidebar.markdown(SIDEBAR_HTML, unsafe_allow_html=True)